@@ -1,14 +1,19 @@
+import io
 import os
 import asyncio
+import hashlib
 import logging
 import gradio as gr
 import aiofiles
 from datetime import datetime
+from pathlib import Path
+from PIL import Image, ImageOps
 from dotenv import load_dotenv
 
 from utils.oracle_storage import OracleCloudStorage
 from utils.llm_service import LLMService
 from utils.request_manager import RequestManager
+from utils.kv_store import create_request_store
 from config import TEMP_DIR, LOGGING_CONFIG, SERVER_HOST, SERVER_PORT
 
 module_name = os.path.basename(__file__)
@@ -29,13 +34,55 @@ load_dotenv()
 # Initialize services
 oracle_storage = OracleCloudStorage()
 llm_service = LLMService()
-request_manager = RequestManager()
+request_manager = RequestManager(store=create_request_store())
 
 # Ensure temp directory exists
 TEMP_DIR.mkdir(exist_ok=True)
 
+# Already-compressed formats that are stored as uploaded, mapped to the extension used for them
+PASSTHROUGH_EXTENSIONS = {'.jpg': '.jpg', '.jpeg': '.jpg', '.webp': '.webp'}
+
+# EXIF tags that keep an image from being stored as uploaded
+EXIF_ORIENTATION = 0x0112
+EXIF_GPS_INFO = 0x8825
+
+def content_object_name(image_bytes, extension):
+    """Name an image object after a hash of its bytes, so re-uploads of the same image map to the same object"""
+    digest = hashlib.blake2b(image_bytes, digest_size=8).hexdigest()
+    return f"{digest}{extension}"
+
+def needs_reencode(source_path):
+    """Check whether a compressed image carries a rotation or a location that must not be passed on as-is"""
+    with Image.open(source_path) as image:
+        exif = image.getexif()  # Reads only the header, not the pixel data
+    return exif.get(EXIF_ORIENTATION, 1) != 1 or EXIF_GPS_INFO in exif
+
+def encode_jpeg(source_path):
+    """Re-encode an image as JPEG bytes, upright and without EXIF metadata"""
+    buffer = io.BytesIO()
+    with Image.open(source_path) as image:
+        ImageOps.exif_transpose(image).convert('RGB').save(buffer, format='JPEG', quality=85, optimize=True)
+    return buffer.getvalue()
+
+async def read_file(path):
+    """Read a whole file without blocking the event loop"""
+    async with aiofiles.open(path, 'rb') as f:
+        return await f.read()
+
+async def write_file(path, data):
+    """Write a whole file without blocking the event loop"""
+    async with aiofiles.open(path, 'wb') as f:
+        await f.write(data)
+
+async def upload_if_missing(image_bytes, object_name):
+    """Upload image data unless an object with this content-derived name already exists"""
+    if await oracle_storage.object_exists(object_name):
+        logging.info(f"{module_name} - Image already uploaded as {object_name}")
+        return object_name
+    return await oracle_storage.upload_image_bytes(image_bytes, object_name)
+
 async def process_image(image):
-    """Process the uploaded image"""
+    """Process the uploaded image file"""
     logging.info(f"{module_name} - Starting image processing")
     
     if image is None:
@@ -48,13 +95,27 @@ async def process_image(image):
     request_id = request_manager.create_request()
     logging.info(f"{module_name} - Created new request with ID: {request_id}")
     
+    # Load the image into memory once: compressed uploads as-is, other formats and photos
+    # with a rotation or GPS tag re-encoded off the event loop. The bytes feed the hash,
+    # the upload and the LLM.
+    extension = PASSTHROUGH_EXTENSIONS.get(Path(image).suffix.lower())
+    if extension and not await asyncio.to_thread(needs_reencode, image):
+        image_bytes = await read_file(image)
+    else:
+        image_bytes = await asyncio.to_thread(encode_jpeg, image)
+        extension = '.jpg'
+    
     # Generate a new filename with timestamp
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    new_filename = f"{timestamp}_{request_id}.jpg"
-    temp_path = TEMP_DIR / new_filename
+    temp_path = TEMP_DIR / f"{timestamp}_{request_id}{extension}"
     
-    # Save PIL image to temporary file
-    image.save(str(temp_path))
+    # Identical images share one object, so check whether this one was already described.
+    # The temp copy, kept to retry a failed upload, is written while the check runs.
+    new_filename = content_object_name(image_bytes, extension)
+    _, existing_metadata = await asyncio.gather(
+        write_file(temp_path, image_bytes),
+        oracle_storage.get_metadata(new_filename)
+    )
     logging.info(f"{module_name} - Saved image to temporary path: {temp_path}")
     
     # Update request with temporary file path
@@ -64,34 +125,50 @@ async def process_image(image):
         temp_path=str(temp_path)
     )
     
-    # Upload to Oracle Cloud Storage
-    logging.info(f"{module_name} - Uploading image to Oracle Cloud Storage: {temp_path}")
-    object_name = await oracle_storage.upload_image(str(temp_path), new_filename)
-    if not object_name:
-        logging.error(f"{module_name} - Failed to upload image to cloud storage")
-        return None, "Failed to upload image to cloud storage."
-    
-    logging.info(f"{module_name} - Image uploaded successfully to cloud storage as: {object_name}")
+    if existing_metadata and existing_metadata.get('approved') is True and existing_metadata.get('description'):
+        # Duplicate of an image whose description the user approved: skip both the upload and the LLM
+        logging.info(f"{module_name} - Image already processed as {new_filename}, reusing its approved description")
+        object_name = new_filename
+        description = existing_metadata['description']
+    elif existing_metadata:
+        # Metadata is only saved after the upload, so the image is already stored; ask the LLM again
+        logging.info(f"{module_name} - Image already uploaded as {new_filename}, sending it to LLM for analysis")
+        object_name = new_filename
+        description = await llm_service.analyze_image_bytes(image_bytes, new_filename)
+    else:
+        # Upload to Oracle Cloud Storage (unless already there) while the LLM analysis runs;
+        # both only need the image bytes
+        logging.info(f"{module_name} - Uploading image to Oracle Cloud Storage and sending it to LLM for analysis: {new_filename}")
+        object_name, description = await asyncio.gather(
+            upload_if_missing(image_bytes, new_filename),
+            llm_service.analyze_image_bytes(image_bytes, new_filename)
+        )
     
-    # Update request with cloud storage path
-    request_manager.update_request(
-        request_id,
-        status='uploaded_to_cloud',
-        cloud_path=object_name
-    )
-    logging.info(f"{module_name} - Request {request_id} updated with cloud path")
+    if object_name:
+        logging.info(f"{module_name} - Image uploaded successfully to cloud storage as: {object_name}")
+        
+        # Update request with cloud storage path
+        request_manager.update_request(
+            request_id,
+            status='uploaded_to_cloud',
+            cloud_path=object_name
+        )
+        logging.info(f"{module_name} - Request {request_id} updated with cloud path")
+    else:
+        # The upload is retried from the temp file when feedback is saved
+        logging.error(f"{module_name} - Failed to upload image to cloud storage")
     
-    # Get image description from LLM
-    logging.info(f"{module_name} - Sending image to LLM for analysis: {temp_path}")
-    description = await llm_service.analyze_image(str(temp_path))
     if not description:
         logging.error(f"{module_name} - LLM analysis failed or returned empty description")
+        if not object_name:
+            return None, "Failed to upload image to cloud storage."
         return None, "Failed to analyze image."
     
     logging.info(f"{module_name} - Received description from LLM: {description[:50]}...")
     
-    # Update request with LLM description
-    request_manager.update_request(
+    # Update request with LLM description and share it with other workers,
+    # which may receive the feedback
+    await request_manager.aupdate_request(
         request_id,
         status='analyzed',
         llm_description=description
@@ -106,10 +183,15 @@ async def save_feedback(request_id, approved, note):
     if not request_id:
         return "No active request. Please upload an image first."
     
-    request = request_manager.get_request(request_id)
+    request = await request_manager.aget_request(request_id)
     if not request:
         return "Invalid request ID."
     
+    # Read the fields now: the record is live and another handler may update it while this one awaits
+    cloud_path = request.cloud_path
+    temp_path = request.temp_path
+    description = request.llm_description
+    
     # Update request with user feedback
     request_manager.update_request(
         request_id,
@@ -118,27 +200,58 @@ async def save_feedback(request_id, approved, note):
         user_note=note
     )
     
+    # Retry the upload if it failed while the image was being analyzed
+    if not cloud_path:
+        # A request loaded from the shared store may have been created by another
+        # worker, whose temp file is not on this machine
+        if not temp_path:
+            logging.error(f"{module_name} - No local copy of the image to retry the upload for request {request_id}")
+            return "Failed to upload image to cloud storage."
+        logging.info(f"{module_name} - Retrying upload for request {request_id}: {temp_path}")
+        try:
+            image_bytes = await read_file(temp_path)
+        except OSError as e:
+            logging.error(f"{module_name} - Failed to read {temp_path} to retry the upload: {str(e)}")
+            return "Failed to upload image to cloud storage."
+        object_name = content_object_name(image_bytes, Path(temp_path).suffix)
+        cloud_path = await oracle_storage.upload_image_bytes(image_bytes, object_name)
+        if not cloud_path:
+            return "Failed to upload image to cloud storage."
+        request_manager.update_request(
+            request_id,
+            cloud_path=cloud_path
+        )
+    
     # Save metadata to Oracle Cloud Storage
     metadata = {
         'timestamp': datetime.now().isoformat(),
-        'description': request['llm_description'],
+        'description': description,
         'approved': approved,
         'note': note
     }
     
-    success = await oracle_storage.save_metadata(request['cloud_path'], metadata)
-    if not success:
-        return "Failed to save feedback to cloud storage."
+    # Uploads of the same image share one metadata file; an approved description is
+    # never overwritten by a later upload's feedback
+    existing_metadata = await oracle_storage.get_metadata(cloud_path)
+    if existing_metadata and existing_metadata.get('approved') is True:
+        logging.info(f"{module_name} - Keeping approved metadata of {cloud_path}, not saving feedback of request {request_id}")
+    else:
+        success = await oracle_storage.save_metadata(cloud_path, metadata)
+        if not success:
+            return "Failed to save feedback to cloud storage."
     
     # Clean up temporary file
     request_manager.clean_temp_file(request_id)
     
     # Update request status
-    request_manager.update_request(
+    await request_manager.aupdate_request(
         request_id,
         status='completed'
     )
     
+    # Nothing reads the request after this; free it now instead of waiting for eviction
+    request_manager.finish_request(request_id)
+    
     return "Thank you for your feedback!" if approved else "Thank you for your feedback. We'll improve our descriptions."
 
 # Create Gradio interface
@@ -148,7 +261,7 @@ with gr.Blocks(title="Image Description App") as app:
     
     with gr.Row():
         with gr.Column():
-            image_input = gr.Image(type="pil", label="Upload or Capture Image", sources=["upload"])
+            image_input = gr.Image(type="filepath", label="Upload or Capture Image", sources=["upload"])
             upload_button = gr.Button("Process Image")
         
         with gr.Column():
@@ -170,21 +283,21 @@ with gr.Blocks(title="Image Description App") as app:
         restart_button = gr.Button("Restart")
     
     # Set up event handlers
-    def log_and_process_image(img):
+    async def log_and_process_image(img):
         logging.info(f"{module_name} - Upload button clicked - processing image")
-        result = asyncio.run(process_image(img))
+        result = await process_image(img)
         logging.info(f"{module_name} - Image processing completed, returning result: {result[1][:30]}...")
         return result
 
-    def log_and_approve_feedback(req_id, note):
+    async def log_and_approve_feedback(req_id, note):
         logging.info(f"{module_name} - Approve button clicked - request ID: {req_id}, note: {note[:30] if note else 'None'}")
-        result = asyncio.run(save_feedback(req_id, True, note))
+        result = await save_feedback(req_id, True, note)
         logging.info(f"{module_name} - Feedback saved (approved): {result}")
         return result
 
-    def log_and_reject_feedback(req_id, note):
+    async def log_and_reject_feedback(req_id, note):
         logging.info(f"{module_name} - Reject button clicked - request ID: {req_id}, note: {note[:30] if note else 'None'}")
-        result = asyncio.run(save_feedback(req_id, False, note))
+        result = await save_feedback(req_id, False, note)
         logging.info(f"{module_name} - Feedback saved (rejected): {result}")
         return result
 
@@ -262,4 +375,7 @@ with gr.Blocks(title="Image Description App") as app:
     )
 
 if __name__ == "__main__":
-    app.launch(server_name=SERVER_HOST, server_port=SERVER_PORT)
\ No newline at end of file
+    try:
+        app.launch(server_name=SERVER_HOST, server_port=SERVER_PORT)
+    finally:
+        asyncio.run(llm_service.aclose())
\ No newline at end of file
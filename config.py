@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 
 # Base directory
@@ -7,6 +8,16 @@ BASE_DIR = Path(os.path.dirname(os.path.abspath(__file__)))
 # Temporary directory for storing images
 TEMP_DIR = BASE_DIR / "temp"
 
+# Local cache of images downloaded by the Gradio image browser, keyed by object ETag
+IMAGE_CACHE_DIR = Path(tempfile.gettempdir()) / "image_browser"
+
+# Maximum number of concurrent Object Storage requests made by the Gradio image browser
+BROWSER_MAX_WORKERS = 32
+
+# Seconds a cached gallery is served before refetching, and interval of the background refresh
+GALLERY_CACHE_TTL = 60
+GALLERY_REFRESH_INTERVAL = 30
+
 # Logging configuration
 LOGGING_CONFIG = {
     'level': 'INFO',
@@ -16,4 +27,9 @@ LOGGING_CONFIG = {
 
 # Server configuration
 SERVER_HOST = "0.0.0.0"
-SERVER_PORT = 3000
\ No newline at end of file
+SERVER_PORT = 3000
+
+# Flask image browser server configuration
+BROWSER_HOST = "0.0.0.0"
+BROWSER_PORT = 5000
+BROWSER_THREADS = 16
\ No newline at end of file
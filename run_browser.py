@@ -0,0 +1,15 @@
+import logging
+from waitress import serve
+
+from utils.image_browser import app
+from config import LOGGING_CONFIG, BROWSER_HOST, BROWSER_PORT, BROWSER_THREADS
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format=LOGGING_CONFIG['format']
+)
+
+if __name__ == "__main__":
+    # Worker threads let concurrent page loads overlap their Object Storage requests
+    serve(app, host=BROWSER_HOST, port=BROWSER_PORT, threads=BROWSER_THREADS)
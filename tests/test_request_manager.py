@@ -0,0 +1,99 @@
+import asyncio
+import unittest
+
+from utils.request_manager import RequestManager
+
+
+class MemoryStore:
+    """Stand-in for the Redis request store"""
+
+    def __init__(self):
+        self.hashes = {}
+
+    async def hset(self, key, mapping, ttl=None):
+        self.hashes.setdefault(key, {}).update(mapping)
+
+    async def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+
+class FinishRequestTest(unittest.TestCase):
+    def test_finished_record_is_not_reused(self):
+        """A record held by a handler keeps its fields after the request is finished"""
+        manager = RequestManager()
+        first = manager.create_request()
+        manager.update_request(first, llm_description='first', cloud_path='first.jpg')
+        held = manager.get_request(first)
+
+        self.assertTrue(manager.finish_request(first))
+        self.assertIsNone(manager.get_request(first))
+
+        second = manager.create_request()
+        manager.update_request(second, llm_description='second', cloud_path='second.jpg')
+
+        self.assertIsNot(held, manager.get_request(second))
+        self.assertEqual(held.llm_description, 'first')
+        self.assertEqual(held.cloud_path, 'first.jpg')
+
+    def test_finished_request_is_not_reloaded_from_store(self):
+        """A request finished on one worker is not brought back from the shared store"""
+        store = MemoryStore()
+        worker, other_worker = RequestManager(store=store), RequestManager(store=store)
+
+        async def finish_and_reload():
+            request_id = worker.create_request()
+            await worker.aupdate_request(request_id, status='analyzed', llm_description='done')
+            self.assertIsNotNone(await other_worker.aget_request(request_id))
+
+            await worker.aupdate_request(request_id, status='completed')
+            worker.finish_request(request_id)
+            return request_id, await worker.aget_request(request_id)
+
+        request_id, reloaded = asyncio.run(finish_and_reload())
+        self.assertIn(request_id, store.hashes)
+        self.assertIsNone(reloaded)
+
+
+class RequestIdTest(unittest.TestCase):
+    def test_only_canonical_id_resolves(self):
+        """Alternative spellings of an ID do not reach the request"""
+        manager = RequestManager()
+        request_id = manager.create_request()
+        self.assertIsNotNone(manager.get_request(request_id))
+
+        for variant in ('0x' + request_id, f' {request_id} ', request_id.upper(), '+' + request_id,
+                        request_id[:16] + '_' + request_id[16:], request_id[:-1], None):
+            self.assertIsNone(manager.get_request(variant))
+            self.assertFalse(manager.update_request(variant, status='analyzed'))
+
+
+class CapacityTest(unittest.TestCase):
+    def test_total_capacity_keeps_most_recent(self):
+        """max_requests caps the whole table and drops the least recently updated requests"""
+        manager = RequestManager(max_requests=10)
+        request_ids = [manager.create_request() for _ in range(100)]
+        manager.update_request(request_ids[0], status='analyzed')  # Dropped long ago
+
+        kept = [request_id for request_id, _ in manager.items()]
+        self.assertEqual(sorted(kept), sorted(request_ids[-10:]))
+
+        oldest = request_ids[-10]
+        manager.update_request(oldest, status='analyzed')
+        newest = manager.create_request()
+        kept = {request_id for request_id, _ in manager.items()}
+        self.assertEqual(len(kept), 10)
+        self.assertIn(oldest, kept)
+        self.assertIn(newest, kept)
+        self.assertNotIn(request_ids[-9], kept)
+
+    def test_finish_request_frees_capacity(self):
+        """Finished requests no longer count towards max_requests"""
+        manager = RequestManager(max_requests=2)
+        first = manager.create_request()
+        manager.finish_request(manager.create_request())
+        manager.create_request()
+        self.assertIsNotNone(manager.get_request(first))
+
+
+if __name__ == '__main__':
+    unittest.main()
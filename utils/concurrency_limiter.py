@@ -0,0 +1,49 @@
+import os
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+module_name = os.path.basename(__file__)
+
+class ConcurrencyLimiter:
+    def __init__(self, name, limit):
+        """Initialize a limiter allowing at most `limit` concurrent calls to a service"""
+        self.name = name
+        self.limit = limit
+        self.in_flight = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(limit)
+        logging.info(f"{module_name} - {name} concurrency limited to {limit}")
+
+    @asynccontextmanager
+    async def slot(self, operation):
+        """
+        Hold one of the limiter's slots for the duration of the block
+
+        Logs how long the call queued for a slot and how long it then took,
+        so saturation shows up as growing wait times.
+
+        Args:
+            operation (str): Description of the call, used in the log line
+        """
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        started_at = time.perf_counter()
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+            finished_at = time.perf_counter()
+            logging.info(
+                f"{module_name} - {self.name} {operation}: waited {(started_at - queued_at) * 1000:.1f} ms, "
+                f"took {(finished_at - started_at) * 1000:.1f} ms "
+                f"({self.in_flight}/{self.limit} in flight, {self.waiting} waiting)"
+            )
@@ -0,0 +1,55 @@
+import os
+import queue
+
+"""
+Fast request ID generation
+
+Request IDs are bearer tokens: whoever holds one can give feedback on that
+request, so they must be unpredictable. uuid.uuid4() makes one os.urandom
+call per ID; this module reads the randomness for a whole batch of IDs in a
+single os.urandom call and hands them out from a pool, so the per-ID cost
+is a queue pop.
+
+new_int() returns each ID as a 128-bit integer with the version 4 UUID
+bits set, which is cheap to hash and small to keep as a dict key; format
+it with f"{value:032x}" where a string is needed.
+"""
+
+# Number of IDs generated per refill of the pool
+POOL_SIZE = 1024
+
+_ID_BYTES = 16
+
+# Clear the version and variant bits, then set version 4 and the RFC 4122 variant
+_CLEAR_MASK = ~((0xF << 76) | (0x3 << 62)) & ((1 << 128) - 1)
+_V4_BITS = (0x4 << 76) | (0x2 << 62)
+
+_pool = queue.SimpleQueue()
+
+def _refill():
+    """Generate a batch of IDs from a single os.urandom call and add them to the pool"""
+    block = os.urandom(_ID_BYTES * POOL_SIZE)
+    for offset in range(0, len(block), _ID_BYTES):
+        value = int.from_bytes(block[offset:offset + _ID_BYTES], 'big')
+        _pool.put((value & _CLEAR_MASK) | _V4_BITS)
+
+def new_int():
+    """
+    Return a new unique request ID as an integer
+
+    Returns:
+        int: 128-bit ID with the version 4 UUID bits set
+    """
+    while True:
+        try:
+            return _pool.get_nowait()
+        except queue.Empty:
+            _refill()
+
+def _reset_after_fork():
+    """Give a forked worker an empty pool, so it never hands out IDs the parent still holds"""
+    global _pool
+    _pool = queue.SimpleQueue()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -1,7 +1,13 @@
 import os
 import json
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import oci
 import gradio as gr
 from utils.oracle_storage import OracleCloudStorage
+from config import IMAGE_CACHE_DIR, BROWSER_MAX_WORKERS, GALLERY_CACHE_TTL, GALLERY_REFRESH_INTERVAL
 
 """
 Gradio Image Browser
@@ -15,56 +21,108 @@ To launch this image browser, run:
 This will start a Gradio web server for browsing images in your configured Oracle Cloud bucket.
 """
 
+module_name = os.path.basename(__file__)
+
+# Gallery payloads keyed by (namespace, bucket), stored as (fetched_at, payload)
+_gallery_cache = {}
+_gallery_cache_lock = threading.Lock()
+
+# Parsed metadata files keyed by object name, stored as (etag, metadata)
+_metadata_cache = {}
+
 class GradioImageBrowser:
     def __init__(self):
         self.storage = OracleCloudStorage()
+        self._refresher = None
+        self._last_visit = time.monotonic()
         
-    def get_images(self):
-        """Fetch all images and their metadata from Oracle Cloud Storage"""
-        # List all objects in the bucket
-        objects = self.storage.object_storage.list_objects(
+    def _list_objects(self):
+        """List every object in the bucket, following pagination"""
+        return oci.pagination.list_call_get_all_results(
+            self.storage.object_storage.list_objects,
             namespace_name=self.storage.namespace,
-            bucket_name=self.storage.bucket_name
+            bucket_name=self.storage.bucket_name,
+            fields="name,etag"
         ).data.objects
 
-        gallery_images = []
-        image_paths = []
-        metadata_list = []
-        
-        for obj in objects:
-            name = obj.name
-            if name.endswith('.metadata.json'):
-                continue  # skip metadata files
-                
-            # Try to get metadata
-            metadata_name = f"{name}.metadata.json"
+    def _fetch_metadata(self, obj):
+        """Download and parse a metadata file unless this ETag is already cached, returning empty metadata if unavailable"""
+        if obj is not None:
+            cached = _metadata_cache.get(obj.name)
+            if cached is not None and cached[0] == obj.etag:
+                return cached[1]
             try:
                 metadata_obj = self.storage.object_storage.get_object(
                     namespace_name=self.storage.namespace,
                     bucket_name=self.storage.bucket_name,
-                    object_name=metadata_name
+                    object_name=obj.name
                 )
                 metadata = json.loads(metadata_obj.data.content.decode('utf-8'))
+                _metadata_cache[obj.name] = (obj.etag, metadata)
+                return metadata
             except Exception:
-                metadata = {
-                    "timestamp": "",
-                    "description": "",
-                    "approved": "",
-                    "note": ""
-                }
-            
-            # Get the image data
-            image_obj = self.storage.object_storage.get_object(
-                namespace_name=self.storage.namespace,
-                bucket_name=self.storage.bucket_name,
-                object_name=name
-            )
-            
-            # Save image to a temporary file
-            temp_path = f"/tmp/{name}"
-            os.makedirs(os.path.dirname(temp_path), exist_ok=True)
-            with open(temp_path, "wb") as f:
-                f.write(image_obj.data.content)
+                pass
+        return {
+            "timestamp": "",
+            "description": "",
+            "approved": "",
+            "note": ""
+        }
+
+    def _fetch_image(self, obj):
+        """Download an image to the local cache unless this ETag is already there"""
+        extension = os.path.splitext(obj.name)[1]
+        temp_path = IMAGE_CACHE_DIR / f"{obj.etag}{extension}"
+        if temp_path.exists():
+            return str(temp_path)
+
+        image_obj = self.storage.object_storage.get_object(
+            namespace_name=self.storage.namespace,
+            bucket_name=self.storage.bucket_name,
+            object_name=obj.name
+        )
+
+        # Write under a temporary name so a partial download is never served from the cache
+        partial_path = temp_path.with_name(f"{temp_path.name}.{threading.get_ident()}.part")
+        try:
+            with open(partial_path, "wb") as f:
+                for chunk in image_obj.data.raw.stream(64 * 1024, decode_content=False):
+                    f.write(chunk)
+        finally:
+            image_obj.data.close()  # Hand the connection back to the pool
+        os.replace(partial_path, temp_path)
+        return str(temp_path)
+
+    def get_images(self):
+        """Fetch all images and their metadata from Oracle Cloud Storage"""
+        # List all objects in the bucket
+        objects = self._list_objects()
+        objects_by_name = {obj.name: obj for obj in objects}
+        image_objects = [obj for obj in objects if not obj.name.endswith('.metadata.json')]
+
+        # Only request metadata files that the listing shows actually exist
+        metadata_objects = [objects_by_name.get(f"{obj.name}.metadata.json") for obj in image_objects]
+
+        # Forget metadata of deleted objects
+        for name in list(_metadata_cache):
+            if name not in objects_by_name:
+                _metadata_cache.pop(name, None)
+
+        IMAGE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+
+        # Fetch metadata and images concurrently instead of 2N sequential round-trips
+        with ThreadPoolExecutor(max_workers=BROWSER_MAX_WORKERS) as executor:
+            metadata_results = executor.map(self._fetch_metadata, metadata_objects)
+            image_results = executor.map(self._fetch_image, image_objects)
+            metadatas = list(metadata_results)
+            temp_paths = list(image_results)
+
+        gallery_images = []
+        image_paths = []
+        metadata_list = []
+        
+        for obj, metadata, temp_path in zip(image_objects, metadatas, temp_paths):
+            name = obj.name
             
             # Format the caption with just the filename for the gallery
             caption = f"{name}"
@@ -84,13 +142,59 @@ class GradioImageBrowser:
             
         return gallery_images, image_paths, metadata_list
     
+    def get_cached_images(self, max_age=GALLERY_CACHE_TTL):
+        """Return the gallery payload, refetching it only when older than max_age seconds"""
+        self._last_visit = time.monotonic()
+        key = (self.storage.namespace, self.storage.bucket_name)
+        entry = _gallery_cache.get(key)
+        if entry is not None and time.monotonic() - entry[0] < max_age:
+            return entry[1]
+
+        return self.refresh_images()
+
+    def refresh_images(self):
+        """Fetch the gallery payload from Oracle Cloud Storage and store it in the cache"""
+        key = (self.storage.namespace, self.storage.bucket_name)
+        # Serialize refreshes so concurrent page loads share one fetch
+        with _gallery_cache_lock:
+            entry = _gallery_cache.get(key)
+            if entry is not None and time.monotonic() - entry[0] < GALLERY_REFRESH_INTERVAL:
+                return entry[1]
+
+            payload = self.get_images()
+            _gallery_cache[key] = (time.monotonic(), payload)
+            return payload
+
+    def _refresh_loop(self):
+        """Keep the gallery cache warm while the browser is being visited"""
+        while True:
+            time.sleep(GALLERY_REFRESH_INTERVAL)
+            # Without recent page loads nobody would see the refresh; the next visit refetches instead
+            if time.monotonic() - self._last_visit > GALLERY_CACHE_TTL:
+                continue
+            try:
+                self.refresh_images()
+            except Exception as e:
+                logging.error(f"{module_name} - Failed to refresh image gallery: {str(e)}")
+
+    def start_refresher(self):
+        """Start the background gallery refresher if it is not already running"""
+        if self._refresher is None:
+            self._refresher = threading.Thread(target=self._refresh_loop, name="gallery-refresher", daemon=True)
+            self._refresher.start()
+
     def launch(self):
         """Launch the Gradio interface"""
-        gallery_images, image_paths, metadata_list = self.get_images()
+        gallery_images, image_paths, metadata_list = self.get_cached_images()
+        self.start_refresher()
         
         with gr.Blocks(title="Image Browser", theme=gr.themes.Soft()) as demo:
             gr.Markdown("# Image Browser")
             
+            # Per-session copy of the lists backing the gallery, so selection indexes
+            # stay consistent with what the visitor is looking at
+            gallery_state = gr.State((image_paths, metadata_list))
+            
             with gr.Row():
                 gallery = gr.Gallery(
                     value=gallery_images,
@@ -119,7 +223,12 @@ class GradioImageBrowser:
                     status_display = gr.Textbox(label="Status", interactive=False)
                     timestamp_display = gr.Textbox(label="Timestamp", interactive=False)
             
-            def select_image(evt: gr.SelectData):
+            def load_gallery():
+                gallery_images, image_paths, metadata_list = self.get_cached_images()
+                return gallery_images, (image_paths, metadata_list)
+            
+            def select_image(state, evt: gr.SelectData):
+                image_paths, metadata_list = state
                 index = evt.index
                 metadata = metadata_list[index]
                 
@@ -135,9 +244,11 @@ class GradioImageBrowser:
                     metadata["timestamp"]
                 ]
             
+            demo.load(load_gallery, None, [gallery, gallery_state])
+            
             gallery.select(
                 select_image, 
-                None, 
+                [gallery_state], 
                 [
                     selected_image, 
                     filename_display, 
@@ -1,6 +1,8 @@
 import os
 import json
-from flask import Flask, jsonify, render_template_string
+import hashlib
+import oci
+from flask import Flask, Response, jsonify, render_template_string, request
 from utils.oracle_storage import OracleCloudStorage
 
 """
@@ -10,22 +12,46 @@ This module provides a web interface for browsing images and their metadata stor
 It lists images, displays thumbnails, and shows associated metadata such as description, notes, approval status, and timestamp.
 
 To launch this image browser, run:
-    python -m utils.image_browser
+    python run_browser.py
 
-This will start a local Flask server for browsing images in your configured Oracle Cloud bucket.
+This will serve the browser with waitress, a multi-threaded production WSGI server, for browsing
+images in your configured Oracle Cloud bucket. For development, `python -m utils.image_browser`
+starts the Flask development server instead (set FLASK_DEBUG=1 to enable the debugger and reloader).
 """
 
 app = Flask(__name__)
 storage = OracleCloudStorage()
 
+# Size of the chunks streamed from Object Storage to the browser
+IMAGE_CHUNK_SIZE = 64 * 1024
+
+# Seconds browsers may reuse the image listing before revalidating it
+LISTING_MAX_AGE = 60
+
+def object_etag(headers):
+    """Return the ETag of an Object Storage response without surrounding quotes"""
+    etag = headers.get('ETag')
+    return etag.strip('"') if etag else None
+
 @app.route('/images')
 def list_images():
     # List all objects in the bucket
-    objects = storage.object_storage.list_objects(
+    objects = oci.pagination.list_call_get_all_results(
+        storage.object_storage.list_objects,
         namespace_name=storage.namespace,
-        bucket_name=storage.bucket_name
+        bucket_name=storage.bucket_name,
+        fields="name,etag"
     ).data.objects
 
+    # The listing changes whenever an image or its metadata changes, so its
+    # ETag can be checked before fetching any metadata
+    digest = hashlib.sha256()
+    for obj in sorted(objects, key=lambda obj: obj.name):
+        digest.update(f"{obj.name}\0{obj.etag}\0".encode('utf-8'))
+    listing_etag = digest.hexdigest()
+    if request.if_none_match.contains(listing_etag):
+        return Response(status=304, headers={'ETag': f'"{listing_etag}"', 'Cache-Control': f'max-age={LISTING_MAX_AGE}'})
+
     images = []
     for obj in objects:
         name = obj.name
@@ -57,18 +83,50 @@ def list_images():
             "approved": metadata.get("approved", ""),
             "timestamp": metadata.get("timestamp", "")
         })
-    return jsonify(images)
+    response = jsonify(images)
+    response.set_etag(listing_etag)
+    response.headers['Cache-Control'] = f'max-age={LISTING_MAX_AGE}'
+    return response
 
 @app.route('/image/<path:object_name>')
 def get_image(object_name):
+    # Answer revalidation requests with a HEAD instead of downloading the image
+    if request.if_none_match:
+        head = storage.object_storage.head_object(
+            namespace_name=storage.namespace,
+            bucket_name=storage.bucket_name,
+            object_name=object_name
+        )
+        etag = object_etag(head.headers)
+        if etag and request.if_none_match.contains(etag):
+            return Response(status=304, headers={'ETag': f'"{etag}"', 'Cache-Control': 'public, max-age=86400'})
+
     # Stream the image from object storage
     obj = storage.object_storage.get_object(
         namespace_name=storage.namespace,
         bucket_name=storage.bucket_name,
         object_name=object_name
     )
-    from flask import Response
-    return Response(obj.data.content, mimetype='image/webp')
+
+    def generate():
+        # Release the Object Storage connection even if the client disconnects mid-stream
+        try:
+            for chunk in obj.data.raw.stream(IMAGE_CHUNK_SIZE, decode_content=False):
+                yield chunk
+        finally:
+            obj.data.close()
+
+    headers = {'Cache-Control': 'public, max-age=86400'}
+    content_length = obj.headers.get('Content-Length')
+    if content_length:
+        headers['Content-Length'] = content_length
+    etag = object_etag(obj.headers)
+    if etag:
+        headers['ETag'] = f'"{etag}"'
+    last_modified = obj.headers.get('Last-Modified')
+    if last_modified:
+        headers['Last-Modified'] = last_modified
+    return Response(generate(), mimetype='image/webp', headers=headers)
 
 @app.route('/')
 def index():
@@ -142,4 +200,5 @@ def index():
     return render_template_string(html)
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    # Development server only; use run_browser.py to serve with waitress
+    app.run(debug=os.getenv("FLASK_DEBUG", "false").lower() in ("1", "true", "yes"))
@@ -0,0 +1,78 @@
+import os
+import logging
+from dotenv import load_dotenv
+
+load_dotenv()
+
+module_name = os.path.basename(__file__)
+
+DEFAULT_REDIS_URL = "redis://localhost:6379/0"
+
+# One client (and connection pool) per Redis URL, shared by every store in the process
+_clients = {}
+
+def get_client(url=None):
+    """
+    Return the shared Redis client for a URL
+
+    Args:
+        url (str, optional): Redis URL. If None, uses REDIS_URL from the .env file
+
+    Returns:
+        redis.asyncio.Redis: Client decoding responses to str
+    """
+    url = url or os.getenv("REDIS_URL", DEFAULT_REDIS_URL)
+    client = _clients.get(url)
+    if client is None:
+        # Imported lazily so Redis is only required when a Redis-backed store is configured
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise ImportError(
+                "The redis package is required for REQUEST_STORE=redis or LLM_CACHE_BACKEND=redis: pip install 'redis>=4.2.0'"
+            ) from e
+
+        client = redis.from_url(url, decode_responses=True)
+        _clients[url] = client
+        logging.info(f"{module_name} - Redis client created for {url}")
+    return client
+
+class KVStore:
+    def __init__(self, prefix="", client=None):
+        """Initialize a key-value store on the shared Redis client, namespacing keys with prefix"""
+        self.prefix = prefix
+        self._client = client if client is not None else get_client()
+
+    async def get(self, key):
+        return await self._client.get(self.prefix + key)
+
+    async def set(self, key, value, ttl=None):
+        await self._client.set(self.prefix + key, value, ex=ttl)
+
+    async def delete(self, key):
+        await self._client.delete(self.prefix + key)
+
+    async def hset(self, key, mapping, ttl=None):
+        """Set fields of a hash, optionally refreshing its expiry in the same round-trip"""
+        async with self._client.pipeline(transaction=True) as pipe:
+            pipe.hset(self.prefix + key, mapping=mapping)
+            if ttl:
+                pipe.expire(self.prefix + key, ttl)
+            await pipe.execute()
+
+    async def hgetall(self, key):
+        return await self._client.hgetall(self.prefix + key)
+
+def create_request_store():
+    """
+    Create the shared request state store selected in the .env file
+
+    Returns:
+        KVStore: Store for request state
+        None: If request state is kept in process memory only
+    """
+    if os.getenv("REQUEST_STORE", "memory").lower() != "redis":
+        return None
+
+    logging.info(f"{module_name} - Using Redis request store")
+    return KVStore(prefix="req:")
@@ -0,0 +1,79 @@
+import os
+import time
+import logging
+from collections import OrderedDict
+from typing import Optional, Protocol
+from dotenv import load_dotenv
+
+from utils.kv_store import KVStore
+
+load_dotenv()
+
+module_name = os.path.basename(__file__)
+
+DEFAULT_TTL = 86400  # Cached descriptions are kept for one day
+
+
+class CacheBackend(Protocol):
+    """Interface every LLM response cache backend must implement"""
+
+    async def get(self, key: str) -> Optional[str]:
+        ...
+
+    async def set(self, key: str, value: str, ttl: int = DEFAULT_TTL) -> None:
+        ...
+
+    async def delete(self, key: str) -> None:
+        ...
+
+
+class MemoryCache:
+    def __init__(self, maxsize=1024):
+        """Initialize an in-process LRU cache with per-entry expiry"""
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+
+    async def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key, value, ttl=DEFAULT_TTL):
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    async def delete(self, key):
+        self._entries.pop(key, None)
+
+
+def create_cache():
+    """
+    Create the cache backend selected in the .env file
+
+    Returns:
+        CacheBackend: Configured cache backend
+        None: If caching is disabled
+    """
+    if os.getenv("LLM_CACHE_ENABLED", "false").lower() not in ("1", "true", "yes"):
+        logging.info(f"{module_name} - LLM response cache disabled")
+        return None
+
+    backend = os.getenv("LLM_CACHE_BACKEND", "memory").lower()
+    if backend == "redis":
+        # Shares its Redis client with the request store
+        logging.info(f"{module_name} - Using Redis LLM response cache")
+        return KVStore(prefix="llm:")
+
+    maxsize = int(os.getenv("LLM_CACHE_MAXSIZE", "1024"))
+    logging.info(f"{module_name} - Using in-memory LLM response cache (maxsize={maxsize})")
+    return MemoryCache(maxsize)
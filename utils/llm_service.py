@@ -1,47 +1,158 @@
 import logging
+import asyncio
+import hashlib
+import mimetypes
 import aiohttp
 import os
 from dotenv import load_dotenv
 
+from utils.llm_cache import create_cache, DEFAULT_TTL
+from utils.concurrency_limiter import ConcurrencyLimiter
+
 load_dotenv()
 
 module_name = os.path.basename(__file__)
 
+PROMPT = "Describe the uploaded image in full detail, applying your expertise as a highly scrupulous image analysis agent. Carefully observe and report every visible element, no matter how small, and provide a thorough, context-aware description. Analyze the relationships, interactions, and possible intentions of objects and subjects in the image. Ensure your description is precise, comprehensive, and avoids assumptions not supported by the image content."
+SYSTEM_PROMPT = "You are an expert image analysis agent. Your task is to provide extremely detailed, accurate, and context-aware descriptions of images. You never miss any detail, no matter how small, and you always strive to understand and explain the context, relationships, and concepts present in the image. Your analysis should be thorough, objective, and insightful, covering not only visible objects but also their arrangement, interactions, possible intentions, emotions, and any relevant background information. Always avoid assumptions not supported by the image, and ensure your description is clear, precise, and comprehensive."
+MAX_TOKENS = '4000'
+TEMPERATURE = '0.5'
+
+# Form fields sent unchanged with every image
+STATIC_FIELDS = (
+    ('prompt', PROMPT),
+    ('system_prompt', SYSTEM_PROMPT),
+    ('max_tokens', MAX_TOKENS),
+    ('temperature', TEMPERATURE),
+)
+
+# Cache keys hash the static fields first, so that part is digested once and copied per image
+_CACHE_KEY_BASE = hashlib.sha256()
+for _name, _value in STATIC_FIELDS:
+    _CACHE_KEY_BASE.update(_value.encode('utf-8'))
+    _CACHE_KEY_BASE.update(b'\0')
+
 class LLMService:
-    def __init__(self):
+    def __init__(self, cache=None):
         """Initialize the LLM service with API details from .env file"""
         self.api_url = os.getenv("LLM_API_URL", "https://api.example.com/analyze")
         self.api_key = os.getenv("LLM_API_KEY", "")
+        self.headers = {
+            'X-API-Key': self.api_key
+        }
+        self.cache = cache if cache is not None else create_cache()
+        self.timeout = aiohttp.ClientTimeout(total=float(os.getenv("LLM_TIMEOUT", "300")), connect=10)
+        self.limiter = ConcurrencyLimiter("LLM", int(os.getenv("LLM_CONCURRENCY", "8")))
+        self._session = None
+        self._session_loop = None
         logging.info(f"{module_name} - LLM service initialized")
-    
-    async def analyze_image(self, image_path):
+
+    async def _get_session(self):
+        """
+        Return the shared HTTP session, creating it on first use
+
+        Reusing one session keeps connections to the LLM endpoint alive
+        between calls. A session is bound to the event loop it was created
+        on, so a new one is created if the service is used from another loop.
+        """
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            if self._session is not None and not self._session.closed:
+                self._discard_session(self._session, self._session_loop)
+            connector = aiohttp.TCPConnector(limit=50, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+            self._session_loop = loop
+            logging.info(f"{module_name} - Created LLM HTTP session")
+        return self._session
+
+    def _discard_session(self, session, loop):
+        """Close a session bound to another event loop, on that loop, without waiting for it"""
+        if loop.is_running():
+            asyncio.run_coroutine_threadsafe(session.close(), loop)
+            logging.info(f"{module_name} - Closing LLM HTTP session of a previous event loop")
+        else:
+            # Its transports can only be closed from their own loop, which no longer runs
+            logging.warning(f"{module_name} - Dropped LLM HTTP session of an event loop that is no longer running")
+
+    async def aclose(self):
+        """Close the shared HTTP session"""
+        session, loop = self._session, self._session_loop
+        self._session = None
+        self._session_loop = None
+        if session is None or session.closed:
+            return
+
+        try:
+            if loop is asyncio.get_running_loop():
+                await session.close()
+            elif loop.is_running():
+                await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(session.close(), loop))
+            # A session whose loop is already closed has nothing left to release
+            logging.info(f"{module_name} - LLM HTTP session closed")
+        except Exception as e:
+            logging.error(f"{module_name} - Failed to close LLM HTTP session: {str(e)}")
+
+    async def _cache_get(self, key):
+        """Look up a cached description, treating backend errors as a miss"""
+        try:
+            return await self.cache.get(key)
+        except Exception as e:
+            logging.warning(f"{module_name} - LLM cache lookup failed: {str(e)}")
+            return None
+
+    async def _cache_set(self, key, description):
+        """Store a description in the cache, ignoring backend errors"""
+        try:
+            await self.cache.set(key, description, ttl=DEFAULT_TTL)
+        except Exception as e:
+            logging.warning(f"{module_name} - LLM cache store failed: {str(e)}")
+
+    async def analyze_image_bytes(self, image_bytes, filename):
         """
-        Send an image to the LLM API for analysis
+        Send in-memory image data to the LLM API for analysis
+
+        Args:
+            image_bytes (bytes): Encoded image data
+            filename (str): Name sent with the image; its extension sets the content type
+
+        Returns:
+            str: Image description if successful
+            None: If analysis fails
         """
         try:
-            logging.info(f"{module_name} - Image received for analysis: {image_path}")
-            prompt = "Describe the uploaded image in full detail, applying your expertise as a highly scrupulous image analysis agent. Carefully observe and report every visible element, no matter how small, and provide a thorough, context-aware description. Analyze the relationships, interactions, and possible intentions of objects and subjects in the image. Ensure your description is precise, comprehensive, and avoids assumptions not supported by the image content."
-            system_prompt = "You are an expert image analysis agent. Your task is to provide extremely detailed, accurate, and context-aware descriptions of images. You never miss any detail, no matter how small, and you always strive to understand and explain the context, relationships, and concepts present in the image. Your analysis should be thorough, objective, and insightful, covering not only visible objects but also their arrangement, interactions, possible intentions, emotions, and any relevant background information. Always avoid assumptions not supported by the image, and ensure your description is clear, precise, and comprehensive."
+            logging.info(f"{module_name} - Image received for analysis: {filename}")
+
+            # Same image, prompts and model parameters resolve to the same cached description
+            cache_key = None
+            if self.cache is not None:
+                digest = _CACHE_KEY_BASE.copy()
+                digest.update(image_bytes)
+                cache_key = digest.hexdigest()
 
+                cached = await self._cache_get(cache_key)
+                if cached:
+                    logging.info(f"{module_name} - Cache hit for {filename}")
+                    return cached
+
+            content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
             data = aiohttp.FormData()
-            data.add_field('prompt', prompt)
-            data.add_field('system_prompt', system_prompt)
-            data.add_field('max_tokens', '4000')
-            data.add_field('temperature', '0.5')
-            data.add_field('images', open(image_path, 'rb'), filename=os.path.basename(image_path), content_type='image/png')
-
-            headers = {
-                'X-API-Key': self.api_key
-            }
-
-            async with aiohttp.ClientSession() as session:
-                async with session.post(self.api_url, data=data, headers=headers) as response:
+            for name, value in STATIC_FIELDS:
+                data.add_field(name, value)
+            data.add_field('images', image_bytes, filename=filename, content_type=content_type)
+
+            session = await self._get_session()
+            async with self.limiter.slot(f"analyze {filename}"):
+                async with session.post(self.api_url, data=data, headers=self.headers) as response:
                     if response.status == 200:
                         result = await response.json()
-                        return result.get('output', '')
+                        description = result.get('output', '')
                     else:
                         logging.error(f"{module_name} - LLM API error: {response.status}")
                         return None
+
+            if cache_key and description:
+                await self._cache_set(cache_key, description)
+            return description
         except Exception as e:
-            logging.error(f"{module_name} - Failed to analyze image {image_path}: {str(e)}")
+            logging.error(f"{module_name} - Failed to analyze image {filename}: {str(e)}")
             return None
\ No newline at end of file
@@ -1,14 +1,20 @@
+import io
 import os
 import json
+import asyncio
 import logging
 import oci
 from dotenv import load_dotenv
-from pathlib import Path
+
+from utils.concurrency_limiter import ConcurrencyLimiter
 
 load_dotenv()
 
 module_name = os.path.basename(__file__)
 
+# Files larger than this are sent as parallel multipart uploads
+MULTIPART_THRESHOLD = 64 * 1024 * 1024
+
 class OracleCloudStorage:
     def __init__(self):
         """Initialize Oracle Cloud Storage client with credentials from .env file"""
@@ -26,41 +32,65 @@ class OracleCloudStorage:
             
             # Initialize the Object Storage client
             self.object_storage = oci.object_storage.ObjectStorageClient(self.config)
+            self.upload_manager = oci.object_storage.UploadManager(self.object_storage, allow_parallel_uploads=True)
+            self.limiter = ConcurrencyLimiter("Object Storage", int(os.getenv("OCI_CONCURRENCY", "32")))
             
             logging.info(f"{module_name} - Oracle Cloud Storage client initialized successfully")
         except Exception as e:
             logging.error(f"{module_name} - Failed to initialize Oracle Cloud Storage client: {str(e)}")
             raise
     
-    async def upload_image(self, file_path, object_name=None):
+    async def _call(self, operation, func, *args, **kwargs):
+        """Run a blocking SDK call in a worker thread, within the concurrency budget"""
+        async with self.limiter.slot(operation):
+            return await asyncio.to_thread(func, *args, **kwargs)
+    
+    def _get_json(self, object_name):
+        """Download and parse a JSON object from Object Storage (blocking)"""
+        response = self.object_storage.get_object(
+            namespace_name=self.namespace,
+            bucket_name=self.bucket_name,
+            object_name=object_name
+        )
+        return json.loads(response.data.content.decode('utf-8'))
+    
+    def _put_bytes(self, data, object_name):
+        """Upload in-memory data to Object Storage (blocking)"""
+        if len(data) > MULTIPART_THRESHOLD:
+            self.upload_manager.upload_stream(
+                self.namespace,
+                self.bucket_name,
+                object_name,
+                io.BytesIO(data)
+            )
+            return
+        
+        self.object_storage.put_object(
+            namespace_name=self.namespace,
+            bucket_name=self.bucket_name,
+            object_name=object_name,
+            put_object_body=data
+        )
+    
+    async def upload_image_bytes(self, data, object_name):
         """
-        Upload an image to Oracle Cloud Object Storage
+        Upload in-memory image data to Oracle Cloud Object Storage
         
         Args:
-            file_path (str): Path to the image file
-            object_name (str, optional): Name to use for the object in storage
-                                        If None, uses the filename
+            data (bytes): Encoded image data
+            object_name (str): Name to use for the object in storage
         
         Returns:
             str: Object name in storage if successful
             None: If upload fails
         """
         try:
-            if not object_name:
-                object_name = Path(file_path).name
+            await self._call(f"upload {object_name}", self._put_bytes, data, object_name)
             
-            with open(file_path, 'rb') as file_data:
-                self.object_storage.put_object(
-                    namespace_name=self.namespace,
-                    bucket_name=self.bucket_name,
-                    object_name=object_name,
-                    put_object_body=file_data.read()
-                )
-            
-            logging.info(f"{module_name} - Successfully uploaded {file_path} to {object_name}")
+            logging.info(f"{module_name} - Successfully uploaded {len(data)} bytes to {object_name}")
             return object_name
         except Exception as e:
-            logging.error(f"{module_name} - Failed to upload {file_path}: {str(e)}")
+            logging.error(f"{module_name} - Failed to upload {object_name}: {str(e)}")
             return None
     
     async def save_metadata(self, object_name, metadata):
@@ -78,7 +108,9 @@ class OracleCloudStorage:
             metadata_object_name = f"{object_name}.metadata.json"
             metadata_json = json.dumps(metadata).encode('utf-8')
             
-            self.object_storage.put_object(
+            await self._call(
+                f"save metadata {object_name}",
+                self.object_storage.put_object,
                 namespace_name=self.namespace,
                 bucket_name=self.bucket_name,
                 object_name=metadata_object_name,
@@ -89,4 +121,54 @@ class OracleCloudStorage:
             return True
         except Exception as e:
             logging.error(f"{module_name} - Failed to save metadata for {object_name}: {str(e)}")
-            return False
\ No newline at end of file
+            return False
+    
+    async def object_exists(self, object_name):
+        """
+        Check whether an object exists in Oracle Cloud Object Storage
+        
+        Args:
+            object_name (str): Name of the object in storage
+        
+        Returns:
+            bool: True if the object exists, False if it does not or the check fails
+        """
+        try:
+            await self._call(
+                f"check {object_name}",
+                self.object_storage.head_object,
+                namespace_name=self.namespace,
+                bucket_name=self.bucket_name,
+                object_name=object_name
+            )
+            return True
+        except oci.exceptions.ServiceError as e:
+            if e.status != 404:
+                logging.error(f"{module_name} - Failed to check {object_name}: {str(e)}")
+            return False
+        except Exception as e:
+            logging.error(f"{module_name} - Failed to check {object_name}: {str(e)}")
+            return False
+    
+    async def get_metadata(self, object_name):
+        """
+        Load the metadata saved for an image in Oracle Cloud Object Storage
+        
+        Args:
+            object_name (str): Name of the object in storage
+        
+        Returns:
+            dict: Saved metadata
+            None: If there is no metadata or it cannot be read
+        """
+        metadata_object_name = f"{object_name}.metadata.json"
+        try:
+            # The body is streamed, so it is read in the same worker thread and limiter slot as the request
+            return await self._call(f"load metadata {object_name}", self._get_json, metadata_object_name)
+        except oci.exceptions.ServiceError as e:
+            if e.status != 404:
+                logging.error(f"{module_name} - Failed to load metadata for {object_name}: {str(e)}")
+            return None
+        except Exception as e:
+            logging.error(f"{module_name} - Failed to load metadata for {object_name}: {str(e)}")
+            return None
\ No newline at end of file
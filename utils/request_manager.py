@@ -1,94 +1,516 @@
 import logging
 import asyncio
-import uuid
-import os
-from pathlib import Path
+import json
+import time
+import queue
+import threading
+import sys
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from os import unlink as _unlink
 
-module_name = os.path.basename(__file__)
+from utils import fastuuid
 
-class RequestManager:
+logger = logging.getLogger(__name__)
+
+# Fields tracked for every request
+FIELDS = ('status', 'temp_path', 'cloud_path', 'llm_description', 'user_feedback', 'user_note')
+_FIELD_SET = frozenset(FIELDS)
+
+# Statuses the manager itself assigns or checks. Interned so status checks
+# compare by identity first, including for values loaded from the store.
+STATUS_CREATED = sys.intern('created')
+STATUS_COMPLETED = sys.intern('completed')
+
+# Seconds after which completed and abandoned requests are evicted
+COMPLETED_TTL = 600
+IDLE_TTL = 3600
+
+# Seconds between eviction sweeps
+EVICTION_INTERVAL = 60
+
+# Number of independently locked shards requests are spread over (a power of two)
+SHARD_COUNT = 64
+
+# Maximum number of temp files deleted per wake-up of the cleaner thread
+DELETE_BATCH_SIZE = 64
+
+# Maximum number of idle per-request locks kept for reuse
+LOCK_POOL_SIZE = 256
+
+# Maximum number of requests held in memory across all shards; least recently updated ones are dropped beyond it
+MAX_REQUESTS = 65536
+
+_HEX_DIGITS = frozenset('0123456789abcdef')
+
+def _to_key(request_id):
+    """
+    Convert an external request ID to the integer key used internally
+
+    Request IDs are handed out as exactly 32 lowercase hex digits. Keying
+    the table on the integer keeps keys small and makes hashing them nearly
+    free. Other spellings int() would accept ("0x" prefix, spaces, uppercase,
+    "_" separators) are rejected, so one request has exactly one ID string
+    for its asyncio lock and its shared store key.
+
+    Returns:
+        int: Table key
+        None: If the ID is malformed, which no stored request matches
+    """
+    if not isinstance(request_id, str) or len(request_id) != 32 or not _HEX_DIGITS.issuperset(request_id):
+        return None
+    return int(request_id, 16)
+
+class RequestRecord:
+    """State of a single request, stored in fixed slots rather than a per-request dict"""
+    __slots__ = FIELDS + ('updated_at',)
+
+    def __init__(self, status=STATUS_CREATED):
+        self.status = status
+        self.temp_path = None
+        self.cloud_path = None
+        self.llm_description = None
+        self.user_feedback = None
+        self.user_note = None
+        self.updated_at = time.monotonic()
+
+    def to_dict(self):
+        """Return the request fields as a dict"""
+        return {field: getattr(self, field) for field in FIELDS}
+
+    def __repr__(self):
+        return f"RequestRecord({self.to_dict()})"
+
+class _Shard:
     def __init__(self):
-        """Initialize the request manager to track concurrent requests"""
-        self.requests = {}  # Dictionary to track all requests
-        logging.info(f"{module_name} - Request manager initialized")
-    
+        """Initialize an empty, independently locked slice of the request table"""
+        self.lock = threading.Lock()
+        self.records = OrderedDict()  # Least recently updated first
+
+class RequestManager:
+    def __init__(self, completed_ttl=COMPLETED_TTL, idle_ttl=IDLE_TTL, store=None, max_requests=MAX_REQUESTS):
+        """
+        Initialize the request manager to track concurrent requests
+
+        Args:
+            completed_ttl (int): Seconds completed requests are kept
+            idle_ttl (int): Seconds requests are kept without updates
+            store (KVStore, optional): Shared store that persisted requests are
+                                       written to, so other workers can load them
+            max_requests (int): Maximum number of requests kept in memory, across all shards
+        """
+        self.completed_ttl = completed_ttl
+        self.idle_ttl = idle_ttl
+        self.store = store
+        self.max_requests = max_requests
+
+        # Number of requests across all shards, so the cap holds however unevenly they fill
+        self._size = 0
+        self._size_lock = threading.Lock()
+
+        # Each shard has its own lock, so requests in different shards never contend
+        self._shards = [_Shard() for _ in range(SHARD_COUNT)]
+        self._eviction_task = None
+
+        # Per-request asyncio locks, reference counted and returned to a free list once unused
+        self._key_locks = {}  # request_id -> [lock, holders]
+        self._free_locks = deque()
+
+        # Temp files are deleted by a background thread, off the request path
+        self._delete_queue = queue.SimpleQueue()
+        self._cleaner = None
+        self._cleaner_lock = threading.Lock()
+        logger.info("Request manager initialized")
+
+    def _shard(self, key):
+        """Return the shard owning a table key"""
+        return self._shards[hash(key) & (SHARD_COUNT - 1)]
+
+    def _start_eviction(self):
+        """Start the background eviction task once an event loop is running"""
+        if self._eviction_task is not None and not self._eviction_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # No loop yet; the next request created from a coroutine starts it
+        self._eviction_task = loop.create_task(self._eviction_loop())
+
+    async def _eviction_loop(self):
+        """Periodically evict finished and abandoned requests"""
+        while True:
+            await asyncio.sleep(EVICTION_INTERVAL)
+            self.evict_expired()
+
+    def evict_expired(self):
+        """
+        Drop completed requests older than completed_ttl and any request
+        not updated for idle_ttl seconds
+
+        Returns:
+            int: Number of evicted requests
+        """
+        evicted = 0
+        orphaned_files = []
+        for shard in self._shards:
+            with shard.lock:
+                now = time.monotonic()
+                expired = [
+                    key for key, record in shard.records.items()
+                    if now - record.updated_at > (self.completed_ttl if record.status == STATUS_COMPLETED else self.idle_ttl)
+                ]
+
+                for key in expired:
+                    record = shard.records.pop(key)
+                    if record.temp_path:
+                        orphaned_files.append(record.temp_path)  # Abandoned requests still own their temp file
+            evicted += len(expired)
+
+        for temp_path in orphaned_files:
+            self._schedule_delete(temp_path)
+
+        if evicted:
+            self._resize(-evicted)
+            logger.info("Evicted %s expired requests", evicted)
+        return evicted
+
+    def _resize(self, delta):
+        """Adjust the request count by delta and return the new count"""
+        with self._size_lock:
+            self._size += delta
+            return self._size
+
+    def _enforce_capacity(self):
+        """Drop the least recently updated requests while the table holds more than max_requests"""
+        displaced = []
+        while self._size > self.max_requests:
+            # Each shard is ordered by last update, so the oldest request overall
+            # is the oldest first entry among the shards
+            oldest_shard = None
+            oldest_at = None
+            for shard in self._shards:
+                with shard.lock:
+                    if shard.records:
+                        updated_at = next(iter(shard.records.values())).updated_at
+                        if oldest_at is None or updated_at < oldest_at:
+                            oldest_shard, oldest_at = shard, updated_at
+            if oldest_shard is None:
+                break
+
+            with oldest_shard.lock:
+                if not oldest_shard.records:
+                    continue  # Emptied meanwhile; look again
+                displaced.append(oldest_shard.records.popitem(last=False)[1])
+            self._resize(-1)
+
+        if not displaced:
+            return
+        for record in displaced:
+            if record.temp_path:
+                self._schedule_delete(record.temp_path)
+        logger.warning("Request table full, dropped %s least recently updated requests", len(displaced))
+
     def create_request(self):
         """
         Create a new request with a unique ID
-        
+
         Returns:
-            str: Unique request ID
-        """
-        request_id = str(uuid.uuid4())
-        self.requests[request_id] = {
-            'status': 'created',
-            'temp_path': None,
-            'cloud_path': None,
-            'llm_description': None,
-            'user_feedback': None,
-            'user_note': None
-        }
-        logging.info(f"{module_name} - Created new request with ID: {request_id}")
+            str: Unique request ID (32 hex digits)
+        """
+        key = fastuuid.new_int()
+        request_id = f"{key:032x}"
+        shard = self._shard(key)
+        record = RequestRecord()
+        with shard.lock:
+            shard.records[key] = record
+        if self._resize(1) > self.max_requests:
+            self._enforce_capacity()
+        self._start_eviction()
+        logger.info("Created new request with ID: %s", request_id)
         return request_id
-    
+
     def update_request(self, request_id, **kwargs):
         """
         Update a request with new information
-        
+
         Args:
             request_id (str): ID of the request to update
             **kwargs: Key-value pairs to update in the request
-        
+
         Returns:
             bool: True if successful, False otherwise
         """
-        if request_id not in self.requests:
-            logging.error(f"{module_name} - Request ID {request_id} not found")
+        if not _FIELD_SET.issuperset(kwargs):
+            unknown = sorted(set(kwargs).difference(_FIELD_SET))
+            logger.error("Unknown request fields for %s: %s", request_id, unknown)
+            return False
+
+        key = _to_key(request_id)
+        shard = self._shard(key)
+        with shard.lock:
+            record = shard.records.get(key)
+            if record is not None:
+                for field, value in kwargs.items():
+                    setattr(record, field, value)
+                record.updated_at = time.monotonic()
+                shard.records.move_to_end(key)
+
+        if record is None:
+            logger.error("Request ID %s not found", request_id)
+            return False
+
+        logger.info("Updated request %s: %r", request_id, kwargs)
+        return True
+
+    def finish_request(self, request_id):
+        """
+        Drop a request that has been fully handled
+
+        A temp file still attached to the request is deleted.
+
+        Args:
+            request_id (str): ID of the request
+
+        Returns:
+            bool: True if the request was dropped, False if not found
+        """
+        key = _to_key(request_id)
+        shard = self._shard(key)
+        with shard.lock:
+            record = shard.records.pop(key, None)
+
+        if record is None:
+            logger.error("Request ID %s not found", request_id)
             return False
-        
-        for key, value in kwargs.items():
-            self.requests[request_id][key] = value
-        
-        logging.info(f"{module_name} - Updated request {request_id}: {kwargs}")
+
+        self._resize(-1)
+        if record.temp_path:
+            self._schedule_delete(record.temp_path)
+        logger.info("Finished request %s", request_id)
         return True
-    
+
     def get_request(self, request_id):
         """
         Get information about a request
-        
+
         Args:
             request_id (str): ID of the request
-        
+
         Returns:
-            dict: Request information
+            RequestRecord: Request information
             None: If request not found
         """
-        if request_id not in self.requests:
-            logging.error(f"{module_name} - Request ID {request_id} not found")
-            return None
-        
-        return self.requests[request_id]
-    
-    def clean_temp_file(self, request_id):
+        key = _to_key(request_id)
+        shard = self._shard(key)
+        with shard.lock:
+            record = shard.records.get(key)
+
+        if record is None:
+            logger.error("Request ID %s not found", request_id)
+        return record
+
+    def items(self):
+        """
+        Iterate over all requests
+
+        Each shard is copied under its own lock, so the result is consistent
+        per shard without ever blocking the whole table.
+
+        Yields:
+            tuple: (request_id, RequestRecord) pairs
+        """
+        for shard in self._shards:
+            with shard.lock:
+                records = list(shard.records.items())
+            for key, record in records:
+                yield f"{key:032x}", record
+
+    @asynccontextmanager
+    async def _key_lock(self, request_id):
+        """
+        Hold the asyncio lock for one request ID
+
+        Only coroutines working on the same request wait for each other. The
+        lock is released back to the pool when its last holder exits, so
+        finished requests leave no lock behind.
         """
-        Delete the temporary file associated with a request
-        
+        entry = self._key_locks.get(request_id)
+        if entry is None:
+            lock = self._free_locks.pop() if self._free_locks else asyncio.Lock()
+            entry = self._key_locks[request_id] = [lock, 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._key_locks[request_id]
+                if len(self._free_locks) < LOCK_POOL_SIZE:
+                    self._free_locks.append(entry[0])
+
+    async def aupdate_request(self, request_id, **kwargs):
+        """
+        Update a request and write it to the shared store
+
+        Concurrent updates of the same request are serialized, so the store
+        always receives them in the order they were applied.
+
         Args:
-            request_id (str): ID of the request
-        
+            request_id (str): ID of the request to update
+            **kwargs: Key-value pairs to update in the request
+
         Returns:
             bool: True if successful, False otherwise
         """
+        async with self._key_lock(request_id):
+            if not self.update_request(request_id, **kwargs):
+                return False
+            return await self.persist_request(request_id)
+
+    async def persist_request(self, request_id):
+        """
+        Write the current state of a request to the shared store
+
+        Args:
+            request_id (str): ID of the request
+
+        Returns:
+            bool: True if persisted or no store is configured, False otherwise
+        """
+        if self.store is None:
+            return True
+
         request = self.get_request(request_id)
-        if not request or not request['temp_path']:
+        if request is None:
             return False
-        
+
         try:
-            temp_path = request['temp_path']
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-                logging.info(f"{module_name} - Deleted temporary file: {temp_path}")
+            mapping = {field: json.dumps(value) for field, value in request.to_dict().items()}
+            await self.store.hset(request_id, mapping, ttl=self.idle_ttl)
             return True
         except Exception as e:
-            logging.error(f"{module_name} - Failed to delete temporary file: {str(e)}")
-            return False
\ No newline at end of file
+            logger.error("Failed to persist request %s: %s", request_id, e)
+            return False
+
+    async def aget_request(self, request_id):
+        """
+        Get information about a request, loading it from the shared store
+        if it was created by another worker
+
+        Completed requests are not loaded: a worker that finished one has
+        dropped it, but its stored copy lives on until the store expires it.
+
+        Args:
+            request_id (str): ID of the request
+
+        Returns:
+            RequestRecord: Request information
+            None: If request not found or already completed
+        """
+        key = _to_key(request_id)
+        shard = self._shard(key)
+        with shard.lock:
+            record = shard.records.get(key)
+        if record is not None:
+            return record
+        if key is None:
+            logger.error("Request ID %s not found", request_id)
+            return None
+        if self.store is None:
+            logger.error("Request ID %s not found", request_id)
+            return None
+
+        try:
+            stored = await self.store.hgetall(request_id)
+        except Exception as e:
+            logger.error("Failed to load request %s: %s", request_id, e)
+            return None
+
+        if not stored:
+            logger.error("Request ID %s not found", request_id)
+            return None
+
+        record = RequestRecord()
+        for field, value in stored.items():
+            if field in _FIELD_SET:
+                setattr(record, field, json.loads(value))
+        if isinstance(record.status, str):
+            record.status = sys.intern(record.status)  # Share one string per status across loaded records
+        if record.status == STATUS_COMPLETED:
+            logger.error("Request ID %s already completed", request_id)
+            return None
+        with shard.lock:
+            # Another coroutine may have loaded it while the store was queried
+            existing = shard.records.get(key)
+            if existing is None:
+                shard.records[key] = record
+        if existing is not None:
+            return existing
+        if self._resize(1) > self.max_requests:
+            self._enforce_capacity()
+        logger.info("Loaded request %s from shared store", request_id)
+        return record
+
+    def clean_temp_file(self, request_id):
+        """
+        Schedule deletion of the temporary file associated with a request
+
+        The file is removed by a background thread shortly afterwards.
+
+        Args:
+            request_id (str): ID of the request
+
+        Returns:
+            bool: True if a file was scheduled for deletion, False otherwise
+        """
+        key = _to_key(request_id)
+        shard = self._shard(key)
+        with shard.lock:
+            record = shard.records.get(key)
+            temp_path = record.temp_path if record is not None else None
+            if temp_path:
+                record.temp_path = None  # Deleted once; eviction has nothing left to clean
+
+        if not temp_path:
+            if record is None:
+                logger.error("Request ID %s not found", request_id)
+            return False
+
+        self._schedule_delete(temp_path)
+        return True
+
+    def _schedule_delete(self, temp_path):
+        """Queue a temp file for the cleaner thread, starting it on first use"""
+        if self._cleaner is None:
+            with self._cleaner_lock:
+                if self._cleaner is None:
+                    self._cleaner = threading.Thread(target=self._cleaner_loop, name="temp-file-cleaner", daemon=True)
+                    self._cleaner.start()
+        self._delete_queue.put(temp_path)
+
+    def _cleaner_loop(self):
+        """Delete queued temp files in batches"""
+        while True:
+            batch = [self._delete_queue.get()]  # Block until there is work
+            while len(batch) < DELETE_BATCH_SIZE:
+                try:
+                    batch.append(self._delete_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            for temp_path in batch:
+                self._remove_file(temp_path)
+
+    def _remove_file(self, temp_path):
+        """Delete a temporary file, returning True if it is gone afterwards"""
+        # A single unlink instead of exists() + remove(): one syscall and no check-then-act race
+        try:
+            _unlink(temp_path)
+            logger.info("Deleted temporary file: %s", temp_path)
+            return True
+        except FileNotFoundError:
+            return True
+        except OSError as e:
+            logger.error("Failed to delete temporary file: %s", e)
+            return False